@@ -0,0 +1,30 @@
+# One-time offline conversion of the trained model to faster-loading formats for the Streamlit app.
+# Requires the packages in requirements-convert.txt (joblib, scikit-learn, skl2onnx).
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from skl2onnx import to_onnx
+
+model_filename = 'readmission_risk_model.joblib'
+onnx_filename = 'readmission_risk_model.onnx'
+weights_filename = 'readmission_risk_model.npz'
+
+sk_model = joblib.load(model_filename)
+
+# A single float32 row with the 5 model features fixes the input name ('X') and dtype;
+# zipmap=False makes the probability output a plain array instead of a list of dicts
+X = np.zeros((1, 5), dtype=np.float32)
+onnx_model = to_onnx(sk_model, X, options={'zipmap': False})
+
+with open(onnx_filename, 'wb') as f:
+    f.write(onnx_model.SerializeToString())
+print(f"Saved ONNX model to '{onnx_filename}'")
+
+# A binary logistic regression is just a dot product, so also ship its raw coefficients;
+# the app loads these with np.load and skips joblib/scikit-learn entirely. Multiclass
+# models are skipped because the app treats the single coef row as the positive-class logit.
+if isinstance(sk_model, LogisticRegression) and len(sk_model.classes_) == 2:
+    np.savez(weights_filename,
+             coef=sk_model.coef_.astype(np.float32),
+             intercept=sk_model.intercept_.astype(np.float32))
+    print(f"Saved model coefficients to '{weights_filename}'")
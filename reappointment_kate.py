@@ -1,44 +1,120 @@
 import streamlit as st
-import joblib
-import pandas as pd
+import numpy as np
 import datetime
-import random # Need random for appointment ID
+import os
+# pandas, joblib and onnxruntime are imported lazily where they are used, so
+# pages that don't need them don't pay their import cost on a cold start
 
 # Define the filename of your saved model
 model_filename = 'readmission_risk_model.joblib'
 
-# Load the trained model
-try:
-    model = joblib.load(model_filename)
+# Feature columns in the order the model was trained on
+features = ['age', 'has_diabetes', 'has_hypertension', 'previous_admissions', 'avg_blood_sugar_last_7_days']
+
+def file_mtime(path):
+    """Returns the modification time of path, or None if it doesn't exist."""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+# Load the trained model once per process and share it across reruns/sessions.
+# Each loader takes the file's mtime as part of its cache key, so a retrained or
+# re-exported file is reloaded; max_entries=1 drops the previous version.
+@st.cache_resource(max_entries=1)
+def load_model(path, mtime):
+    import joblib
+    return joblib.load(path)
+
+# Raw logistic-regression coefficients (see convert_model.py); when present, the
+# joblib model is not loaded at all and risk is computed with a dot product
+weights_filename = 'readmission_risk_model.npz'
+
+@st.cache_resource(max_entries=1)
+def load_weights(path, mtime):
+    with np.load(path) as w:
+        return w['coef'], w['intercept']
+
+# ONNX export of the same model (see convert_model.py); when present (and onnxruntime
+# is installed), both probabilities and labels come from ONNX Runtime instead of scikit-learn
+onnx_filename = 'readmission_risk_model.onnx'
+
+@st.cache_resource(max_entries=1)
+def load_session(path, mtime):
+    import onnxruntime as ort
+    return ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+model_mtime = file_mtime(model_filename)
+weights_mtime = file_mtime(weights_filename)
+onnx_mtime = file_mtime(onnx_filename)
+
+def export_is_current(path, mtime):
+    """Whether an exported copy of the model exists and is at least as new as the joblib file."""
+    if mtime is None:
+        return False
+    # A retrained joblib model must not be shadowed by an export from the previous one
+    if model_mtime is not None and mtime < model_mtime:
+        st.warning(f"'{path}' is older than '{model_filename}' and will be ignored. Rerun convert_model.py to refresh it.")
+        return False
+    return True
+
+weights = load_weights(weights_filename, weights_mtime) if export_is_current(weights_filename, weights_mtime) else None
+
+sess = None
+if weights is None and export_is_current(onnx_filename, onnx_mtime):
+    try:
+        sess = load_session(onnx_filename, onnx_mtime)
+    except ImportError:
+        st.warning(f"'{onnx_filename}' found but onnxruntime is not installed; falling back to '{model_filename}'.")
+
+if weights is not None or sess is not None:
+    model = None
     st.success("Readmission Risk Model loaded successfully!")
-except FileNotFoundError:
-    st.error(f"Error: Model file '{model_filename}' not found. Make sure it's in the same directory.")
-    #st.stop() # Don't stop the app if model not found, just disable prediction
+else:
+    try:
+        model = load_model(model_filename, model_mtime)
+        st.success("Readmission Risk Model loaded successfully!")
+    except FileNotFoundError:
+        st.error(f"Error: Model file '{model_filename}' not found. Make sure it's in the same directory.")
+        model = None
+        #st.stop() # Don't stop the app if model not found, just disable prediction
+
+# Identifies which model file (and version of it) answers predictions this rerun
+if weights is not None:
+    model_version = f"{weights_filename}@{weights_mtime}"
+elif sess is not None:
+    model_version = f"{onnx_filename}@{onnx_mtime}"
+else:
+    model_version = f"{model_filename}@{model_mtime}"
 
 # --- Class Definitions (copied from the original notebook) ---
+# __slots__ keeps instances free of a per-object __dict__
 class Patient:
+    __slots__ = ('patient_id', 'name', 'phone_number', 'medical_history')
+
     def __init__(self, patient_id, name, phone_number, medical_history):
         self.patient_id = patient_id
         self.name = name
         self.phone_number = phone_number # Used for M-Pesa and reminders
         self.medical_history = medical_history
-        self.vitals = [] # A list to store vitals logs
-        self.appointments = []
 
     def __repr__(self):
         return f"Patient({self.name}, ID: {self.patient_id})"
 
 class Doctor:
+    __slots__ = ('doctor_id', 'name', 'specialization')
+
     def __init__(self, doctor_id, name, specialization):
         self.doctor_id = doctor_id
         self.name = name
         self.specialization = specialization
-        self.appointments = []
 
     def __repr__(self):
         return f"Dr. {self.name} ({self.specialization})"
 
 class Appointment:
+    __slots__ = ('appointment_id', 'patient', 'doctor', 'appointment_time', 'status', 'video_call_link')
+
     def __init__(self, appointment_id, patient, doctor, appointment_time):
         self.appointment_id = appointment_id
         self.patient = patient
@@ -51,13 +127,17 @@ class Appointment:
         return f"Appointment({self.appointment_id} for {self.patient.name} with {self.doctor.name} at {self.appointment_time})"
 
 class VitalsLog:
-    def __init__(self, patient, log_time, data):
+    __slots__ = ('patient', 'log_time', 'systolic', 'diastolic', 'blood_sugar')
+
+    def __init__(self, patient, log_time, systolic, diastolic, blood_sugar):
         self.patient = patient
         self.log_time = log_time
-        self.data = data # e.g., {'blood_pressure': '120/80', 'blood_sugar': '5.5mmol/L'}
+        self.systolic = systolic
+        self.diastolic = diastolic
+        self.blood_sugar = blood_sugar # mmol/L
 
     def __repr__(self):
-        return f"Vitals for {self.patient.name} at {self.log_time}: {self.data}"
+        return f"Vitals for {self.patient.name} at {self.log_time}: {self.systolic}/{self.diastolic}, {self.blood_sugar}mmol/L"
 
 # --- Simple In-Memory Database (for demonstration) ---
 # In a real app, this would be a persistent database
@@ -65,8 +145,11 @@ if 'patients_db' not in st.session_state:
     st.session_state.patients_db = {}
 if 'doctors_db' not in st.session_state:
     st.session_state.doctors_db = {}
-if 'appointments_db' not in st.session_state:
-    st.session_state.appointments_db = {}
+# Appointments are stored column-wise in a single DataFrame rather than as
+# Appointment objects, so the View page can be built with vectorized merges
+appointment_dtypes = {'appointment_id': 'object', 'patient_id': 'object', 'doctor_id': 'object', 'appointment_time': 'datetime64[ns]', 'status': 'object'}
+if 'next_app_id' not in st.session_state:
+    st.session_state.next_app_id = 1 # Monotonic counter so appointment IDs never collide
 
 # Add sample patient and doctor if not already present
 if "PAT001" not in st.session_state.patients_db:
@@ -76,6 +159,16 @@ if "DOC501" not in st.session_state.doctors_db:
 
 
 # --- Core App Functions (adapted for Streamlit session state) ---
+def append_row(key, dtypes, row):
+    """Appends row to the session DataFrame stored under key, creating it on first use."""
+    if key not in st.session_state:
+        import pandas as pd
+        st.session_state[key] = pd.DataFrame({c: pd.Series(dtype=t) for c, t in dtypes.items()})
+    df = st.session_state[key]
+    df.loc[len(df)] = row
+    # Setting with enlargement re-infers column dtypes, so restore the declared ones
+    st.session_state[key] = df.astype(dtypes, copy=False)
+
 def schedule_appointment(patient_id, doctor_id, appointment_time):
     """Schedules a new appointment."""
     if patient_id not in st.session_state.patients_db or doctor_id not in st.session_state.doctors_db:
@@ -84,15 +177,84 @@ def schedule_appointment(patient_id, doctor_id, appointment_time):
     patient = st.session_state.patients_db[patient_id]
     doctor = st.session_state.doctors_db[doctor_id]
 
-    appointment_id = f"APP{random.randint(1000, 9999)}"
+    aid = st.session_state.next_app_id
+    st.session_state.next_app_id += 1
+    appointment_id = f"APP{aid:06d}"
     new_appointment = Appointment(appointment_id, patient, doctor, appointment_time)
 
-    st.session_state.appointments_db[appointment_id] = new_appointment
-    patient.appointments.append(new_appointment)
-    doctor.appointments.append(new_appointment)
+    append_row('appointments_df', appointment_dtypes, (appointment_id, patient_id, doctor_id, appointment_time, new_appointment.status))
 
     return new_appointment
 
+def predict_batch(X):
+    """Predicts readmission risk for every row of X (columns ordered as `features`) in a single predict_proba call."""
+    # Tree models work on float32 internally; converting up front avoids a copy inside sklearn
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    if weights is not None:
+        coef, intercept = weights
+        z = (X @ coef.T + intercept)[:, 0]
+        # Numerically stable sigmoid (same as scipy's expit), no overflow for large negative z
+        return np.exp(-np.logaddexp(0, -z))
+    if sess is not None:
+        return sess.run(None, {'X': X})[1][:, 1]
+    return model.predict_proba(X)[:, 1]
+
+# Repeat clicks with unchanged inputs are served from the cache instead of re-running the model;
+# model_version is part of the key so results from a replaced model are never reused
+@st.cache_data(max_entries=1024)
+def predict_risk(model_version, age, has_diabetes, has_hypertension, previous_admissions, avg_blood_sugar_last_7_days):
+    """Predicts readmission risk for a single patient."""
+    x = np.array([[age, has_diabetes, has_hypertension,
+                   previous_admissions, avg_blood_sugar_last_7_days]], dtype=np.float32)
+    return float(predict_batch(x)[0])
+
+def predict_labels(X):
+    """Predicts the readmission class (0 or 1) for every row of X."""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    if weights is not None:
+        coef, intercept = weights
+        return ((X @ coef.T + intercept)[:, 0] > 0).astype(int)
+    if sess is not None:
+        return sess.run(None, {'X': X})[0]
+    return model.predict(X)
+
+def predict_bulk(X, min_rows_per_shard=10000):
+    """Predicts readmission risk for a large X by scoring row shards in parallel threads."""
+    n_shards = min(os.cpu_count() or 1, len(X) // min_rows_per_shard)
+    # ONNX Runtime and the .npz matrix product (via BLAS) already spread one call over
+    # all cores, so sharding on top of either would oversubscribe
+    if n_shards <= 1 or sess is not None or weights is not None:
+        return predict_batch(X)
+    # scikit-learn and NumPy release the GIL in their compiled kernels, so threads can
+    # run shards concurrently without copying the model into worker processes
+    from joblib import Parallel, delayed
+    shards = np.array_split(X, n_shards)
+    return np.concatenate(Parallel(n_jobs=n_shards, prefer='threads')(delayed(predict_batch)(shard) for shard in shards))
+
+def score_bulk_csv(uploaded):
+    """Scores every patient in an uploaded CSV, returning the results or an error message."""
+    import pandas as pd
+    try:
+        bulk_df = pd.read_csv(uploaded)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+        return "Error: Could not read the uploaded file as a CSV."
+    if bulk_df.empty:
+        return "Error: CSV contains no patient rows."
+    missing = [f for f in features if f not in bulk_df.columns]
+    if missing:
+        return f"Error: CSV is missing columns: {', '.join(missing)}"
+
+    # Blank and non-numeric cells become NaN; the model can't score those rows
+    X = bulk_df[features].apply(pd.to_numeric, errors='coerce')
+    bad_rows = X.index[X.isna().any(axis=1)]
+    if len(bad_rows):
+        lines = ', '.join(str(i + 2) for i in bad_rows[:10]) + (', ...' if len(bad_rows) > 10 else '')
+        return f"Error: {len(bad_rows)} row(s) have missing or non-numeric values (CSV lines {lines})."
+
+    # Keep the non-feature columns (e.g. a patient ID) so each risk can be traced back
+    id_columns = [c for c in bulk_df.columns if c not in features]
+    return bulk_df[id_columns].join(X).assign(risk=predict_bulk(X.values))
+
 
 # --- Streamlit App Interface ---
 st.title("TibaSasa Healthcare App")
@@ -101,65 +263,73 @@ st.title("TibaSasa Healthcare App")
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Readmission Risk Prediction", "Schedule Appointment", "View Appointments"])
 
-if page == "Readmission Risk Prediction":
+# Each page is a fragment, so widget interactions only rerun the active page
+@st.fragment
+def _risk_page():
     st.header("Readmission Risk Prediction")
     st.write("Enter patient details to predict their readmission risk.")
 
-    if 'model' in locals() and model: # Check if model was loaded successfully
+    if model is not None or weights is not None or sess is not None: # Check if model was loaded successfully
         # Input widgets for patient data
         age = st.slider("Age", min_value=18, max_value=100, value=50)
         has_diabetes = st.checkbox("Has Diabetes")
         has_hypertension = st.checkbox("Has Hypertension")
         previous_admissions = st.number_input("Number of Previous Admissions", min_value=0, value=0)
         avg_blood_sugar_last_7_days = st.number_input("Average Blood Sugar (last 7 days, e.g., mmol/L)", min_value=0.0, value=5.0, format="%.2f")
-
-        # Convert checkbox boolean to integer (0 or 1)
-        has_diabetes_int = 1 if has_diabetes else 0
-        has_hypertension_int = 1 if has_hypertension else 0
+        show_probability = st.checkbox("Show probability", value=True)
 
         # Button to trigger prediction
         if st.button("Predict Risk"):
-            # Prepare the input data as a DataFrame
-            patient_data = {
-                'age': age,
-                'has_diabetes': has_diabetes_int,
-                'has_hypertension': has_hypertension_int,
-                'previous_admissions': previous_admissions,
-                'avg_blood_sugar_last_7_days': avg_blood_sugar_last_7_days
-            }
-            input_df = pd.DataFrame([patient_data])
-
-            # Ensure the column order matches the training data
-            features = ['age', 'has_diabetes', 'has_hypertension', 'previous_admissions', 'avg_blood_sugar_last_7_days']
-            input_df = input_df[features]
-
-            # Make the prediction
-            risk_probability = model.predict_proba(input_df)[:, 1]
-            risk_score = risk_probability[0]
-
-            # Display the result
+            # Make the prediction; predicting the label is cheaper when only the class is needed
             st.subheader("Prediction Result:")
-            st.write(f"The predicted readmission risk is: **{risk_score:.2f}**")
+            if show_probability:
+                risk_score = predict_risk(model_version, age, float(has_diabetes), float(has_hypertension),
+                                          previous_admissions, avg_blood_sugar_last_7_days)
+                st.write(f"The predicted readmission risk is: **{risk_score:.2f}**")
+                high_risk = risk_score > 0.5
+            else:
+                # Prepare the input data as a single-row array (column order matches `features`)
+                # Checkbox booleans become 0.0/1.0 directly via float()
+                x = np.array([[age, float(has_diabetes), float(has_hypertension),
+                               previous_admissions, avg_blood_sugar_last_7_days]], dtype=np.float32)
+                high_risk = int(predict_labels(x)[0]) == 1
 
             # Provide a simple interpretation
-            if risk_score > 0.5:
+            if high_risk:
                 st.warning("This patient has a higher predicted risk of readmission.")
             else:
                 st.info("This patient has a lower predicted risk of readmission.")
+
+        # Bulk scoring: one vectorized prediction over every patient in the CSV
+        st.subheader("Bulk Prediction")
+        uploaded = st.file_uploader("Bulk CSV", type="csv")
+        if uploaded is not None:
+            results = score_bulk_csv(uploaded)
+            if isinstance(results, str):
+                st.error(results) # Display error message
+            else:
+                st.dataframe(results)
     else:
         st.warning("Readmission risk prediction is unavailable because the model could not be loaded.")
 
 
-elif page == "Schedule Appointment":
+@st.fragment
+def _schedule_page():
     st.header("Schedule Follow-up Appointment")
 
     # Simple dropdowns for patient and doctor (using sample data)
-    patient_id_select = st.selectbox("Select Patient", list(st.session_state.patients_db.keys()), format_func=lambda x: st.session_state.patients_db[x].name)
-    doctor_id_select = st.selectbox("Select Doctor", list(st.session_state.doctors_db.keys()), format_func=lambda x: st.session_state.doctors_db[x].name)
+    # Labels are precomputed once per rerun so format_func is a plain dict lookup
+    pid_to_name = {pid: p.name for pid, p in st.session_state.patients_db.items()}
+    did_to_name = {did: d.name for did, d in st.session_state.doctors_db.items()}
+    patient_id_select = st.selectbox("Select Patient", list(pid_to_name), format_func=pid_to_name.get)
+    doctor_id_select = st.selectbox("Select Doctor", list(did_to_name), format_func=did_to_name.get)
 
     # Date and time input
     appointment_date = st.date_input("Appointment Date", datetime.date.today())
-    appointment_time = st.time_input("Appointment Time", datetime.datetime.now().time())
+    # Snapshot the default once per session so it doesn't drift on every rerun
+    if 'default_time' not in st.session_state:
+        st.session_state.default_time = datetime.datetime.now().time()
+    appointment_time = st.time_input("Appointment Time", st.session_state.default_time)
 
     # Combine date and time
     appointment_datetime = datetime.datetime.combine(appointment_date, appointment_time)
@@ -171,20 +341,33 @@ elif page == "Schedule Appointment":
         else:
             st.error(new_appointment) # Display error message
 
-elif page == "View Appointments":
+@st.fragment
+def _view_page():
     st.header("Scheduled Appointments")
 
-    if st.session_state.appointments_db:
-        # Display appointments (simple table or list)
-        appointments_list = []
-        for app_id, app in st.session_state.appointments_db.items():
-            appointments_list.append({
-                "Appointment ID": app.appointment_id,
-                "Patient": app.patient.name,
-                "Doctor": app.doctor.name,
-                "Time": app.appointment_time.strftime('%Y-%m-%d %H:%M'),
-                "Status": app.status
-            })
-        st.table(pd.DataFrame(appointments_list))
+    # The DataFrame (and pandas) only exists once an appointment has been scheduled
+    appointments_df = st.session_state.get('appointments_df')
+    if appointments_df is not None and not appointments_df.empty:
+        import pandas as pd
+        # Build the view in one shot from the stored columns: names are looked up with
+        # vectorized Series.map, and times stay datetimes for the browser to format
+        pid_to_name = {pid: p.name for pid, p in st.session_state.patients_db.items()}
+        did_to_name = {did: d.name for did, d in st.session_state.doctors_db.items()}
+        view_df = pd.DataFrame({
+            "Appointment ID": appointments_df['appointment_id'],
+            "Patient": appointments_df['patient_id'].map(pid_to_name),
+            "Doctor": appointments_df['doctor_id'].map(did_to_name),
+            "Time": appointments_df['appointment_time'],
+            "Status": appointments_df['status']
+        }).convert_dtypes(dtype_backend='pyarrow') # Arrow-backed columns serialize to the browser without conversion
+        # st.dataframe renders a virtualized grid, so large tables stay responsive (unlike st.table)
+        st.dataframe(view_df, hide_index=True, use_container_width=True)
     else:
-        st.info("No appointments scheduled yet.")
\ No newline at end of file
+        st.info("No appointments scheduled yet.")
+
+pages = {
+    "Readmission Risk Prediction": _risk_page,
+    "Schedule Appointment": _schedule_page,
+    "View Appointments": _view_page,
+}
+pages[page]()
\ No newline at end of file